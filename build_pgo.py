@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Build the _py_locks extension with profile-guided optimization (PGO).
+
+The extension is first built with instrumentation, then the stress tests
+are run against it as the training workload, and finally the extension is
+rebuilt in place using the collected profile.
+
+Usage:
+    python build_pgo.py [-t THREADS] [-d DURATION]
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+
+root_dir = os.path.dirname(os.path.abspath(__file__))
+pgo_dir = os.path.join(root_dir, 'build', 'pgo')
+
+
+def build(mode):
+    """Build the extension in place using the given PGO mode"""
+    env = dict(os.environ, PY_LOCKS_PGO=mode, PY_LOCKS_PGO_DIR=pgo_dir)
+    subprocess.run(
+        [sys.executable, 'setup.py', 'build_ext', '--inplace', '--force'],
+        cwd=root_dir,
+        env=env,
+        check=True,
+    )
+
+
+def train(threads, duration):
+    """Run the stress tests against the instrumented extension"""
+    env = dict(os.environ, PYTHONPATH=os.path.join(root_dir, 'src'))
+    for module in ('py_locks.stress_rlock', 'py_locks.stress_rwlock'):
+        subprocess.run(
+            [sys.executable, '-m', module, '-t', str(threads)]
+            + ['-d', str(duration)],
+            cwd=root_dir,
+            env=env,
+            check=True,
+        )
+
+
+def merge_clang_profiles():
+    """Merge raw Clang profiles into default.profdata, if there are any"""
+    raw_profiles = glob.glob(os.path.join(pgo_dir, '*.profraw'))
+    if not raw_profiles:
+        return
+    if shutil.which('llvm-profdata'):
+        profdata = ['llvm-profdata']
+    elif sys.platform == 'darwin':
+        profdata = ['xcrun', 'llvm-profdata']
+    else:
+        sys.exit('llvm-profdata is required to merge Clang profiles')
+    output = os.path.join(pgo_dir, 'default.profdata')
+    subprocess.run(
+        profdata + ['merge', '-o', output] + raw_profiles, check=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build _py_locks with profile-guided optimization'
+    )
+    parser.add_argument(
+        '-t',
+        '--threads',
+        type=int,
+        default=os.cpu_count() or 8,
+        help='Number of training threads (default: CPU count)',
+    )
+    parser.add_argument(
+        '-d',
+        '--duration',
+        type=int,
+        default=20,
+        help='Duration of each training run in seconds (default: 20)',
+    )
+    args = parser.parse_args()
+
+    # Start from an empty profile directory
+    shutil.rmtree(pgo_dir, ignore_errors=True)
+    os.makedirs(pgo_dir)
+
+    build('generate')
+    train(args.threads, args.duration)
+    merge_clang_profiles()
+    build('use')
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,10 @@
 #include <stdbool.h>
 #define ATOMIC_LOAD(addr, order) atomic_load_explicit(addr, order)
 #define ATOMIC_STORE(addr, val, order) atomic_store_explicit(addr, val, order)
+#define ATOMIC_CAS(addr, expected, val, order) \
+    atomic_compare_exchange_strong_explicit(addr, expected, val, order, memory_order_relaxed)
+#define ATOMIC_CAS_WEAK(addr, expected, val, order) \
+    atomic_compare_exchange_weak_explicit(addr, expected, val, order, memory_order_relaxed)
 #define ATOMIC_T(T) _Atomic(T)
 #else
 // for MSVC, might need to enable the /experimental:c11atomics build flag
@@ -19,13 +23,18 @@
 // Usage: Zero-initialize the struct (e.g., = {0} or calloc).
 // No explicit init or destroy functions are needed.
 typedef struct {
-    PyMutex reader_lock;        // Protects reader count
+    PyMutex reader_lock;        // Serializes reader count changes to and from zero
     PyMutex writer_lock;        // Ensures exclusive write access
-    int32_t nreaders;           // Number of active readers (protected by reader_lock)
+    ATOMIC_T(int32_t) nreaders; // Number of active readers
     ATOMIC_T(unsigned long) writer_id;  // Thread ID of current writer (0 = locked by readers)
     unsigned long level;        // Recursion level for write locks
+    PyMutex handover;           // Held by the upgrader until the last reader hands it writer_lock
 } py_rwlock;
 
+// Set in nreaders while a thread waits in py_rwlock_upgrade().  The waiting
+// thread's own read lock is no longer included in the count.
+#define PY_RWLOCK_UPGRADER ((int32_t)1 << 30)
+
 ////////////////////////////////////////////////////////////////////
 
 void py_rwlock_lock_read(py_rwlock *rwlock)
@@ -38,14 +47,33 @@ void py_rwlock_lock_read(py_rwlock *rwlock)
         return;
     }
 
+    // Fast path: if other readers already hold the lock, join them by
+    // incrementing the count.  Only the 0 -> 1 transition needs reader_lock.
+    int32_t n = ATOMIC_LOAD(&rwlock->nreaders, memory_order_relaxed);
+    while (n > 0) {
+        if (ATOMIC_CAS_WEAK(&rwlock->nreaders, &n, n + 1, memory_order_acquire)) {
+            return;
+        }
+    }
+
     PyMutex_Lock(&rwlock->reader_lock);
-    rwlock->nreaders++;
-    if (rwlock->nreaders == 1) {
-        // First reader acquires writer lock to block writers
-        PyMutex_Lock(&rwlock->writer_lock);
-        // Zero means locked by readers
-        ATOMIC_STORE(&rwlock->writer_id, 0, memory_order_release);
+    // Readers may have arrived while we waited.  The count can still drop
+    // to zero under us (try_upgrade), but only rises from zero while
+    // holding reader_lock.
+    n = ATOMIC_LOAD(&rwlock->nreaders, memory_order_relaxed);
+    while (n > 0) {
+        if (ATOMIC_CAS_WEAK(&rwlock->nreaders, &n, n + 1, memory_order_acquire)) {
+            PyMutex_Unlock(&rwlock->reader_lock);
+            return;
+        }
     }
+    // First reader acquires writer lock to block writers
+    PyMutex_Lock(&rwlock->writer_lock);
+    // Zero means locked by readers
+    ATOMIC_STORE(&rwlock->writer_id, 0, memory_order_release);
+    // Publish the count only once writer_lock is held, so fast path
+    // readers never get in ahead of a writer
+    ATOMIC_STORE(&rwlock->nreaders, 1, memory_order_release);
     PyMutex_Unlock(&rwlock->reader_lock);
 }
 
@@ -62,12 +90,33 @@ void py_rwlock_unlock_read(py_rwlock *rwlock)
         return;
     }
 
+    // Fast path: if other readers remain, just decrement the count.  The
+    // last reader must take the slow path even with an upgrader waiting.
+    int32_t n = ATOMIC_LOAD(&rwlock->nreaders, memory_order_relaxed);
+    while ((n & ~PY_RWLOCK_UPGRADER) > 1) {
+        if (ATOMIC_CAS_WEAK(&rwlock->nreaders, &n, n - 1, memory_order_release)) {
+            return;
+        }
+    }
+
     PyMutex_Lock(&rwlock->reader_lock);
-    rwlock->nreaders--;
-    if (rwlock->nreaders == 0) {
+    // Fast path readers can still join, so the count may change under us.
+    // The last reader also clears the upgrader flag, so that new readers
+    // take the slow path and wait for the upgraded writer.
+    n = ATOMIC_LOAD(&rwlock->nreaders, memory_order_relaxed);
+    while (!ATOMIC_CAS_WEAK(&rwlock->nreaders, &n,
+                            n == (PY_RWLOCK_UPGRADER | 1) ? 0 : n - 1,
+                            memory_order_acq_rel)) {
+    }
+    if (n == 1) {
         // Last reader releases writer lock
         PyMutex_Unlock(&rwlock->writer_lock);
     }
+    else if (n == (PY_RWLOCK_UPGRADER | 1)) {
+        // Pass writer lock straight to the thread waiting in
+        // py_rwlock_upgrade(), so no other writer can take it first
+        PyMutex_Unlock(&rwlock->handover);
+    }
     PyMutex_Unlock(&rwlock->reader_lock);
 }
 
@@ -119,27 +168,70 @@ bool py_rwlock_is_locked_by_current_thread(py_rwlock *rwlock)
 //
 // Upgrade fails if:
 // - Other readers are present, OR
-// - Caller holds read lock recursively (appears as multiple readers)
+// - Caller holds read lock recursively (appears as multiple readers), OR
+// - Another thread is waiting in py_rwlock_upgrade()
 bool py_rwlock_try_upgrade(py_rwlock *rwlock)
 {
     unsigned long thread_id = PyThread_get_thread_ident();
 
-    PyMutex_Lock(&rwlock->reader_lock);
+    // A single CAS turns "one reader" into "no readers".  It fails if other
+    // readers are present (or we hold the read lock recursively), and if an
+    // upgrader is waiting, since its flag is set in the count.
+    int32_t expected = 1;
+    if (!ATOMIC_CAS(&rwlock->nreaders, &expected, 0, memory_order_acquire)) {
+        return false;
+    }
 
-    // Check if we're the only reader
-    if (rwlock->nreaders == 1) {
-        // We're the only reader, can upgrade
-        rwlock->nreaders = 0;
+    // We still hold writer_lock from being a reader, so we are now the writer
+    ATOMIC_STORE(&rwlock->writer_id, thread_id, memory_order_release);
+    return true;
+}
 
-        // Acquire write lock (we still hold writer_lock from being a reader)
-        ATOMIC_STORE(&rwlock->writer_id, thread_id, memory_order_release);
+// Upgrade from read lock to write lock, waiting for other readers to leave
+// Returns true if upgrade succeeded, false otherwise
+//
+// Assumes caller currently holds exactly one read lock (non-recursive).
+// If successful, caller now holds write lock (read lock is released).  No
+// other writer can acquire the lock between the two, although other readers
+// may have come and gone, so state read before the call must be re-checked.
+// If unsuccessful, caller still holds the original read lock and must
+// release it before calling py_rwlock_lock_write(), or the waiting upgrader
+// will never get the lock.
+//
+// Calling this while holding the read lock recursively deadlocks: the
+// caller's other read locks are counted as readers that it waits for.
+//
+// Upgrade fails if:
+// - Another thread is already waiting in py_rwlock_upgrade()
+bool py_rwlock_upgrade(py_rwlock *rwlock)
+{
+    unsigned long thread_id = PyThread_get_thread_ident();
 
+    // reader_lock serializes upgraders, and the last reader's handover, so
+    // only one thread at a time can set the flag and hold handover
+    PyMutex_Lock(&rwlock->reader_lock);
+    int32_t n = ATOMIC_LOAD(&rwlock->nreaders, memory_order_relaxed);
+    if (n & PY_RWLOCK_UPGRADER) {
         PyMutex_Unlock(&rwlock->reader_lock);
-        return true;
+        return false;
+    }
+    // Held until the last reader unlocks it, which passes writer_lock on to
+    // us.  It must be locked before the flag is visible to other readers.
+    PyMutex_Lock(&rwlock->handover);
+    // Drop our read lock and set the flag in one step, so that try_upgrade()
+    // can never see a count of one while we wait
+    while (!ATOMIC_CAS_WEAK(&rwlock->nreaders, &n,
+                            n == 1 ? 0 : (n - 1) | PY_RWLOCK_UPGRADER,
+                            memory_order_acq_rel)) {
     }
-
-    // Cannot upgrade - other readers present (or we have recursive read locks)
     PyMutex_Unlock(&rwlock->reader_lock);
-    return false;
-}
 
+    if (n != 1) {
+        // Wait for the last other reader to leave
+        PyMutex_Lock(&rwlock->handover);
+    }
+    // Otherwise we were the only reader, so we already hold writer_lock
+    PyMutex_Unlock(&rwlock->handover);
+    ATOMIC_STORE(&rwlock->writer_id, thread_id, memory_order_release);
+    return true;
+}
@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 
 import os
-import sys
+import tempfile
 
 from setuptools import Extension, setup
+from setuptools.command.build_ext import build_ext
 
 # Path to header files (in project root)
 root_dir = os.path.dirname(os.path.abspath(__file__))
@@ -15,12 +16,96 @@ msvc_compile_args = [
     # 2. Flag to enable C11 standard (required for atomics)
     # Use /std:c17 for C17 support, or /std:c11 for C11
     '/std:c17',
+    # 3. Optimize for speed and enable whole program optimization
+    '/O2',
+    '/GL',
 ]
+msvc_link_args = ['/LTCG']
+
+# Optimization flags for GCC and Clang.  Each one is probed before use and
+# silently dropped if the compiler rejects it.
+posix_compile_args = ['-O3', '-flto', '-fno-plt', '-fvisibility=hidden']
+
+# Optional profile-guided optimization (PGO) build mode, normally driven by
+# build_pgo.py.  Set PY_LOCKS_PGO to "generate" for an instrumented build or
+# to "use" to build with the collected profile.  Profiles are stored in
+# PY_LOCKS_PGO_DIR (default: build/pgo).
+pgo_mode = os.environ.get('PY_LOCKS_PGO', '')
+if pgo_mode not in ('', 'generate', 'use'):
+    raise ValueError(f'PY_LOCKS_PGO must be "generate" or "use": {pgo_mode!r}')
+pgo_dir = os.path.abspath(
+    os.environ.get('PY_LOCKS_PGO_DIR', os.path.join(root_dir, 'build', 'pgo'))
+)
+
+
+def compiler_accepts(compiler, flag):
+    """Return true if the compiler can build a trivial file using flag"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src = os.path.join(tmp_dir, 'probe.c')
+        with open(src, 'w') as f:
+            f.write('int main(void) { return 0; }\n')
+        try:
+            compiler.compile(
+                [src], output_dir=tmp_dir, extra_postargs=[flag, '-Werror']
+            )
+        except Exception:
+            return False
+    return True
+
+
+def posix_pgo_args(compiler):
+    """Return the GCC/Clang compile and link flags for the PGO build mode"""
+    if pgo_mode == 'generate':
+        return [f'-fprofile-generate={pgo_dir}']
+    if pgo_mode == 'use':
+        # Clang needs the raw profiles merged into a .profdata file, which
+        # build_pgo.py does.  GCC reads the .gcda files from the directory.
+        profdata = os.path.join(pgo_dir, 'default.profdata')
+        path = profdata if os.path.exists(profdata) else pgo_dir
+        args = [f'-fprofile-use={path}']
+        if compiler_accepts(compiler, '-fprofile-correction'):
+            # Profiles from multi-threaded runs can be slightly inconsistent
+            args.append('-fprofile-correction')
+        return args
+    return []
+
+
+def msvc_pgo_args():
+    """Return the MSVC link flags for the PGO build mode"""
+    pgd = os.path.join(pgo_dir, '_py_locks.pgd')
+    if pgo_mode == 'generate':
+        return [f'/GENPROFILE:PGD={pgd}']
+    if pgo_mode == 'use':
+        return [f'/USEPROFILE:PGD={pgd}']
+    return []
+
+
+class optimized_build_ext(build_ext):
+    """Select compiler flags based on the compiler actually in use.
+
+    Checking the compiler type rather than the platform means that MinGW
+    and other GCC-like compilers on Windows get the GCC flags.
+    """
+
+    def build_extensions(self):
+        if self.compiler.compiler_type == 'msvc':
+            compile_args = msvc_compile_args
+            link_args = msvc_link_args + msvc_pgo_args()
+        else:
+            compile_args = [
+                flag
+                for flag in posix_compile_args
+                if compiler_accepts(self.compiler, flag)
+            ]
+            link_args = ['-flto'] if '-flto' in compile_args else []
+            pgo_args = posix_pgo_args(self.compiler)
+            compile_args += pgo_args
+            link_args += pgo_args
+        for ext in self.extensions:
+            ext.extra_compile_args = compile_args
+            ext.extra_link_args = link_args
+        super().build_extensions()
 
-if sys.platform == 'win32':
-    extra_args = msvc_compile_args
-else:
-    extra_args = []
 
 setup(
     ext_modules=[
@@ -28,7 +113,7 @@ setup(
             'py_locks._py_locks',
             sources=['src/py_locks/_py_locks.c'],
             include_dirs=include_dirs,
-            extra_compile_args=extra_args,
         ),
     ],
+    cmdclass={'build_ext': optimized_build_ext},
 )
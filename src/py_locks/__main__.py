@@ -13,9 +13,12 @@ To run stress tests:
   python -m py_locks.stress_rwlock [-t THREADS] [-d DURATION]
 
 Options:
-  -t, --threads   Number of worker threads (default: 8)
+  -t, --threads   Number of worker threads (default: 8; stress_rlock
+                  uses fewer if fewer CPUs are available)
   -d, --duration  Test duration in seconds (default: 10)
 
+Run either stress test with --help to see all of its options.
+
 Examples:
   python -m py_locks.stress_rlock -t 16 -d 30
   python -m py_locks.stress_rwlock -t 8 -d 10
@@ -2,10 +2,67 @@
 #include "py_rwlock.h"
 #include "py_rlock.h"
 
-// Python object wrapping py_rwlock
+#ifdef _WIN32
+#include <windows.h>
+#else
+#include <time.h>
+#endif
+
+// CPU hint used inside spin loops (PAUSE on x86, YIELD on ARM)
+#if defined(_WIN32)
+#define CPU_RELAX() YieldProcessor()
+#elif defined(__x86_64__) || defined(__i386__)
+#include <immintrin.h>
+#define CPU_RELAX() _mm_pause()
+#elif defined(__aarch64__) || defined(__arm__)
+#define CPU_RELAX() __asm__ __volatile__("yield")
+#else
+#define CPU_RELAX() ((void)0)
+#endif
+
+// Assumed cache line size, used to keep each lock on its own line
+#define CACHE_LINE_SIZE 64
+
+#ifdef _WIN32
+static LARGE_INTEGER perf_freq;  // Set once in py_locks_exec()
+#endif
+
+// Read the platform monotonic clock, in nanoseconds
+static uint64_t
+monotonic_ns(void)
+{
+#ifdef _WIN32
+    LARGE_INTEGER now;
+    QueryPerformanceCounter(&now);
+    uint64_t ticks = (uint64_t)now.QuadPart;
+    uint64_t freq = (uint64_t)perf_freq.QuadPart;
+    return (ticks / freq) * 1000000000 + (ticks % freq) * 1000000000 / freq;
+#else
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (uint64_t)ts.tv_sec * 1000000000 + (uint64_t)ts.tv_nsec;
+#endif
+}
+
+// Spin for the given number of nanoseconds.  Does not need the GIL.
+static void
+busy_wait(uint64_t ns)
+{
+    uint64_t target = monotonic_ns() + ns;
+    while (monotonic_ns() < target) {
+        CPU_RELAX();
+    }
+}
+
+// Python object wrapping py_rwlock.  The padding keeps the lock off the
+// cache lines holding this object's header, which other threads write when
+// they change the reference count, and off the line of the next allocation.
+// Objects are only 16-byte aligned, so a full line is needed on each side.
 typedef struct {
     PyObject_HEAD
+    char head_pad[CACHE_LINE_SIZE];
     py_rwlock rwlock;
+    char tail_pad[CACHE_LINE_SIZE];
 } RWLockObject;
 
 static PyObject *
@@ -55,6 +112,13 @@ RWLockObject_try_upgrade(RWLockObject *self, PyObject *Py_UNUSED(ignored))
     return PyBool_FromLong(upgraded);
 }
 
+static PyObject *
+RWLockObject_upgrade(RWLockObject *self, PyObject *Py_UNUSED(ignored))
+{
+    bool upgraded = py_rwlock_upgrade(&self->rwlock);
+    return PyBool_FromLong(upgraded);
+}
+
 static PyObject *
 RWLockObject_is_locked_by_current_thread(RWLockObject *self, PyObject *Py_UNUSED(ignored))
 {
@@ -73,6 +137,8 @@ static PyMethodDef RWLockObject_methods[] = {
      "Release write lock"},
     {"try_upgrade", (PyCFunction)RWLockObject_try_upgrade, METH_NOARGS,
      "Try to upgrade from read lock to write lock"},
+    {"upgrade", (PyCFunction)RWLockObject_upgrade, METH_NOARGS,
+     "Upgrade from read lock to write lock, waiting for other readers"},
     {"is_locked_by_current_thread", (PyCFunction)RWLockObject_is_locked_by_current_thread, METH_NOARGS,
      "Check if write lock is held by current thread"},
     {NULL, NULL, 0, NULL}
@@ -89,10 +155,12 @@ static PyTypeObject RWLockObjectType = {
     .tp_methods = RWLockObject_methods,
 };
 
-// Python object wrapping py_rlock
+// Python object wrapping py_rlock, padded like RWLockObject
 typedef struct {
     PyObject_HEAD
+    char head_pad[CACHE_LINE_SIZE];
     py_rlock rlock;
+    char tail_pad[CACHE_LINE_SIZE];
 } RLockObject;
 
 static PyObject *
@@ -121,6 +189,74 @@ RLockObject_unlock(RLockObject *self, PyObject *Py_UNUSED(ignored))
     Py_RETURN_NONE;
 }
 
+// Context manager support: "with m:" acquires and releases the lock.
+// __exit__ uses METH_FASTCALL so no argument tuple is built; the exception
+// details are ignored and never suppressed.
+static PyObject *
+RLockObject_enter(RLockObject *self, PyObject *Py_UNUSED(ignored))
+{
+    py_rlock_lock(&self->rlock);
+    return Py_NewRef(self);
+}
+
+static PyObject *
+RLockObject_exit(RLockObject *self, PyObject *const *Py_UNUSED(args),
+                 Py_ssize_t Py_UNUSED(nargs))
+{
+    py_rlock_unlock(&self->rlock);
+    Py_RETURN_NONE;
+}
+
+// Parse the count argument of lock_n() and unlock_n()
+static Py_ssize_t
+rlock_count_arg(PyObject *arg)
+{
+    Py_ssize_t n = PyLong_AsSsize_t(arg);
+    if (n == -1 && PyErr_Occurred()) {
+        return -1;
+    }
+    if (n < 1) {
+        PyErr_SetString(PyExc_ValueError, "count must be at least 1");
+        return -1;
+    }
+    return n;
+}
+
+// Acquire the lock n times with a single call.  Only the first acquire
+// can block; the rest just bump the recursion level.
+static PyObject *
+RLockObject_lock_n(RLockObject *self, PyObject *arg)
+{
+    Py_ssize_t n = rlock_count_arg(arg);
+    if (n < 0) {
+        return NULL;
+    }
+    py_rlock_lock(&self->rlock);
+    self->rlock.level += (size_t)(n - 1);
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+RLockObject_unlock_n(RLockObject *self, PyObject *arg)
+{
+    Py_ssize_t n = rlock_count_arg(arg);
+    if (n < 0) {
+        return NULL;
+    }
+    if (!py_rlock_is_locked_by_current_thread(&self->rlock)) {
+        PyErr_SetString(PyExc_RuntimeError, "cannot release un-acquired lock");
+        return NULL;
+    }
+    if (self->rlock.level < (size_t)(n - 1)) {
+        PyErr_SetString(PyExc_ValueError,
+                        "count is larger than the recursion depth");
+        return NULL;
+    }
+    self->rlock.level -= (size_t)(n - 1);
+    py_rlock_unlock(&self->rlock);
+    Py_RETURN_NONE;
+}
+
 static PyObject *
 RLockObject_is_locked_by_current_thread(RLockObject *self, PyObject *Py_UNUSED(ignored))
 {
@@ -133,6 +269,14 @@ static PyMethodDef RLockObject_methods[] = {
      "Acquire recursive lock"},
     {"unlock", (PyCFunction)RLockObject_unlock, METH_NOARGS,
      "Release recursive lock"},
+    {"lock_n", (PyCFunction)RLockObject_lock_n, METH_O,
+     "Acquire recursive lock count times"},
+    {"unlock_n", (PyCFunction)RLockObject_unlock_n, METH_O,
+     "Release recursive lock count times"},
+    {"__enter__", (PyCFunction)RLockObject_enter, METH_NOARGS,
+     "Acquire recursive lock"},
+    {"__exit__", (PyCFunction)(void (*)(void))RLockObject_exit, METH_FASTCALL,
+     "Release recursive lock"},
     {"is_locked_by_current_thread", (PyCFunction)RLockObject_is_locked_by_current_thread, METH_NOARGS,
      "Check if lock is held by current thread"},
     {NULL, NULL, 0, NULL}
@@ -149,13 +293,231 @@ static PyTypeObject RLockObjectType = {
     .tp_methods = RLockObject_methods,
 };
 
+// Busy wait helper used by the stress tests
+static PyObject *
+py_locks_busy_wait_ns(PyObject *module, PyObject *arg)
+{
+    unsigned long long ns = PyLong_AsUnsignedLongLong(arg);
+    if (ns == (unsigned long long)-1 && PyErr_Occurred()) {
+        return NULL;
+    }
+    // Release the GIL so other threads can run while we spin
+    Py_BEGIN_ALLOW_THREADS
+    busy_wait(ns);
+    Py_END_ALLOW_THREADS
+    Py_RETURN_NONE;
+}
+
+// xoshiro256** random number generator, used by the native stress workers
+typedef struct {
+    uint64_t s[4];
+} rng_state;
+
+static inline uint64_t
+rotl(uint64_t x, int k)
+{
+    return (x << k) | (x >> (64 - k));
+}
+
+static uint64_t
+rng_next(rng_state *rng)
+{
+    uint64_t *s = rng->s;
+    uint64_t result = rotl(s[1] * 5, 7) * 9;
+    uint64_t t = s[1] << 17;
+    s[2] ^= s[0];
+    s[3] ^= s[1];
+    s[1] ^= s[2];
+    s[0] ^= s[3];
+    s[2] ^= t;
+    s[3] = rotl(s[3], 45);
+    return result;
+}
+
+// Initialize the state from a single seed using splitmix64
+static void
+rng_seed(rng_state *rng, uint64_t seed)
+{
+    for (int i = 0; i < 4; i++) {
+        uint64_t z = (seed += 0x9e3779b97f4a7c15);
+        z = (z ^ (z >> 30)) * 0xbf58476d1ce4e5b9;
+        z = (z ^ (z >> 27)) * 0x94d049bb133111eb;
+        rng->s[i] = z ^ (z >> 31);
+    }
+}
+
+// Busy wait for a random duration of 0.8 to 1.2 times avg_ns
+static void
+busy_wait_jitter(rng_state *rng, uint64_t avg_ns)
+{
+    busy_wait(avg_ns * (800 + rng_next(rng) % 401) / 1000);
+}
+
+// Native version of the worker loop in stress_rlock.py.  Runs without the
+// GIL until the stop flag is set and returns (locks, recursive_locks).
+static PyObject *
+py_locks_rlock_stress_worker(PyObject *module, PyObject *args)
+{
+    RLockObject *lock;
+    Py_buffer counter, stop;
+    if (!PyArg_ParseTuple(args, "O!w*y*:rlock_stress_worker",
+                          &RLockObjectType, &lock, &counter, &stop)) {
+        return NULL;
+    }
+    if (counter.len != sizeof(uint64_t) || stop.len != sizeof(int)) {
+        PyErr_SetString(PyExc_ValueError,
+                        "counter must be a c_uint64 and stop flag a c_int");
+        PyBuffer_Release(&counter);
+        PyBuffer_Release(&stop);
+        return NULL;
+    }
+
+    uint64_t *shared_counter = (uint64_t *)counter.buf;
+    volatile int *stop_flag = (volatile int *)stop.buf;
+    unsigned long long locks = 0, recursive_locks = 0;
+    rng_state rng;
+    rng_seed(&rng, monotonic_ns() ^ PyThread_get_thread_ident());
+
+    Py_BEGIN_ALLOW_THREADS
+    while (!*stop_flag) {
+        // 50% unlocked work, 30% simple lock, 20% recursive lock
+        uint64_t op = rng_next(&rng) % 100;
+        if (op < 50) {
+            busy_wait_jitter(&rng, 30000);
+            continue;
+        }
+        int depth = op < 80 ? 1 : 2 + (int)(rng_next(&rng) % 3);
+
+        busy_wait_jitter(&rng, 10000);
+        for (int i = 0; i < depth; i++) {
+            py_rlock_lock(&lock->rlock);
+        }
+        // Non-atomic read-modify-write
+        uint64_t old_value = *shared_counter;
+        busy_wait_jitter(&rng, 2000);
+        *shared_counter = old_value + 1;
+        for (int i = 0; i < depth; i++) {
+            py_rlock_unlock(&lock->rlock);
+        }
+        busy_wait_jitter(&rng, 10000);
+
+        if (depth == 1) {
+            locks++;
+        }
+        else {
+            recursive_locks++;
+        }
+    }
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&counter);
+    PyBuffer_Release(&stop);
+    return Py_BuildValue("(KK)", locks, recursive_locks);
+}
+
+// Native version of the standard worker loop in stress_rwlock.py.  Runs
+// without the GIL until the stop flag is set and returns
+// (reads, writes, recursive, errors).
+static PyObject *
+py_locks_rwlock_stress_worker(PyObject *module, PyObject *args)
+{
+    RWLockObject *lock;
+    Py_buffer counter, stop;
+    unsigned long long think_ns, hold_ns;
+    unsigned int read_percent;
+    if (!PyArg_ParseTuple(args, "O!w*y*KKI:rwlock_stress_worker",
+                          &RWLockObjectType, &lock, &counter, &stop,
+                          &think_ns, &hold_ns, &read_percent)) {
+        return NULL;
+    }
+    if (counter.len != sizeof(int64_t) || stop.len != sizeof(int)) {
+        PyErr_SetString(PyExc_ValueError,
+                        "counter must be a c_int64 and stop flag a c_int");
+        PyBuffer_Release(&counter);
+        PyBuffer_Release(&stop);
+        return NULL;
+    }
+    if (read_percent > 100) {
+        PyErr_SetString(PyExc_ValueError,
+                        "read_percent must be from 0 to 100");
+        PyBuffer_Release(&counter);
+        PyBuffer_Release(&stop);
+        return NULL;
+    }
+
+    // volatile so that both reads under the read lock really happen
+    volatile int64_t *shared_counter = (volatile int64_t *)counter.buf;
+    volatile int *stop_flag = (volatile int *)stop.buf;
+    py_rwlock *rwlock = &lock->rwlock;
+    unsigned long long reads = 0, writes = 0, recursive = 0, errors = 0;
+    rng_state rng;
+    rng_seed(&rng, monotonic_ns() ^ PyThread_get_thread_ident());
+
+    Py_BEGIN_ALLOW_THREADS
+    while (!*stop_flag) {
+        // 50% unlocked work.  Of the locked operations, read_percent are
+        // reads and the rest are split between writes and recursive writes.
+        if (rng_next(&rng) % 100 < 50) {
+            busy_wait_jitter(&rng, think_ns);
+            continue;
+        }
+
+        busy_wait_jitter(&rng, think_ns);
+        uint64_t op = rng_next(&rng) % 100;
+        if (op < read_percent) {
+            py_rwlock_lock_read(rwlock);
+            int64_t value1 = *shared_counter;
+            busy_wait_jitter(&rng, hold_ns);
+            int64_t value2 = *shared_counter;
+            py_rwlock_unlock_read(rwlock);
+            if (value1 != value2) {
+                errors++;
+            }
+            reads++;
+        }
+        else if ((op - read_percent) % 2 == 0) {
+            py_rwlock_lock_write(rwlock);
+            // Non-atomic read-modify-write
+            int64_t old_value = *shared_counter;
+            busy_wait_jitter(&rng, hold_ns);
+            *shared_counter = old_value + 1;
+            py_rwlock_unlock_write(rwlock);
+            writes++;
+        }
+        else {
+            py_rwlock_lock_write(rwlock);
+            py_rwlock_lock_write(rwlock);  // Recursive
+            *shared_counter += 1;
+            py_rwlock_unlock_write(rwlock);
+            py_rwlock_unlock_write(rwlock);
+            recursive++;
+        }
+        busy_wait_jitter(&rng, think_ns);
+    }
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&counter);
+    PyBuffer_Release(&stop);
+    return Py_BuildValue("(KKKK)", reads, writes, recursive, errors);
+}
+
 static PyMethodDef py_locks_methods[] = {
+    {"busy_wait_ns", (PyCFunction)py_locks_busy_wait_ns, METH_O,
+     "Spin (without holding the GIL) for the given number of nanoseconds"},
+    {"rlock_stress_worker", (PyCFunction)py_locks_rlock_stress_worker, METH_VARARGS,
+     "Run the RLock stress test worker loop in C until the stop flag is set"},
+    {"rwlock_stress_worker", (PyCFunction)py_locks_rwlock_stress_worker, METH_VARARGS,
+     "Run the RWLock stress test worker loop in C until the stop flag is set"},
     {NULL, NULL, 0, NULL}
 };
 
 static int
 py_locks_exec(PyObject *module)
 {
+#ifdef _WIN32
+    QueryPerformanceFrequency(&perf_freq);
+#endif
+
     Py_INCREF(&RWLockObjectType);
     if (PyModule_AddObject(module, "RWLock", (PyObject *)&RWLockObjectType) < 0) {
         Py_DECREF(&RWLockObjectType);
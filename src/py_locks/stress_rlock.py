@@ -7,156 +7,314 @@ Usage:
 """
 
 import argparse
-import random
+import array
+import ctypes
+import os
+import signal
+import statistics
 import threading
 import time
-from dataclasses import dataclass
 
 from . import RLock
+from ._py_locks import busy_wait_ns, rlock_stress_worker
+
+# Default number of worker threads, limited to the CPUs available to us
+DEFAULT_THREADS = min(8, os.process_cpu_count() or 8)
 
 
-@dataclass
 class ThreadStats:
-    """Statistics for a single thread"""
+    """Statistics for all threads, stored as one array per field.
+
+    Each array has one slot per thread, indexed by thread id.  Operations
+    done during the warmup are only kept in warmup_ops_performed.
+    """
+
+    __slots__ = (
+        "locks_performed",
+        "recursive_locks_performed",
+        "warmup_ops_performed",
+        "errors_detected",
+        "lock_waits",
+    )
+
+    def __init__(self, threads):
+        self.locks_performed = array.array("q", [0] * threads)
+        self.recursive_locks_performed = array.array("q", [0] * threads)
+        self.warmup_ops_performed = array.array("q", [0] * threads)
+        self.errors_detected = array.array("q", [0] * threads)
+        # Per-thread samples of how long each lock acquire waited
+        self.lock_waits = [array.array("q") for _ in range(threads)]
+
 
-    thread_id: int
-    locks_performed: int = 0
-    recursive_locks_performed: int = 0
-    errors_detected: int = 0
+# Operations are picked by mapping a random byte through this table:
+# 50% unlocked work (0), 30% simple lock (1), 20% recursive lock (2)
+OPERATION_TABLE = bytes([0] * 128 + [1] * 77 + [2] * 51)
 
+# Each operation also consumes this many random bytes:
+#   [0] recursion depth,
+#   [1], [2], [3] jitter for the busy work before, during and after locking
+RANDOM_BYTES_PER_OP = 4
 
-def busy_wait_microseconds(microseconds):
-    """Busy wait for specified microseconds"""
-    start = time.perf_counter()
-    target = start + (microseconds / 1_000_000)
-    while time.perf_counter() < target:
-        pass
+# Random values are generated for this many operations at a time
+OPS_PER_BATCH = 1024
 
+# Set to end a running test early.  main() sets it on Ctrl-C so that the
+# workers are stopped cleanly and the results are still reported.  Each
+# test clears it when it starts.
+stop_requested = threading.Event()
 
-def do_busy_work(rng, avg_microseconds=30):
+# Maximum number of lock wait samples kept per thread
+MAX_WAIT_SAMPLES = 1_000_000
+
+
+def do_busy_work(jitter, avg_microseconds=30):
     """Do busy work with random duration around the average.
 
     Args:
-        rng: Random number generator instance
+        jitter: Random byte (0-255) used to vary the duration
         avg_microseconds: Average duration in microseconds (default: 30)
                          Actual duration will be 0.8 to 1.2 times this value
     """
-    duration = avg_microseconds * (0.8 + rng.random() * 0.4)
-    busy_wait_microseconds(duration)
+    busy_wait_ns(int(avg_microseconds * (800 + jitter * (400 / 255))))
+
 
+def unlocked_operation(lock, unlock, shared_counter, rand, waits):
+    """Perform busy work without taking the lock"""
+    do_busy_work(rand[1])
 
-def lock_operation(rlock, shared_counter, stats, rng):
+
+def lock_operation(lock, unlock, shared_counter, rand, waits):
     """Perform a simple lock operation"""
     # Do some work before acquiring lock
-    do_busy_work(rng, avg_microseconds=10)
+    do_busy_work(rand[1], avg_microseconds=10)
+
+    # The shared counter advances once per acquisition, so it acts as a
+    # "lock clock" measuring how many other acquires happened while we waited
+    before = shared_counter.value
 
-    rlock.lock()
+    lock()
 
     # Non-atomic read-modify-write
-    old_value = shared_counter[0]
+    old_value = shared_counter.value
 
     # Short work while holding lock
-    do_busy_work(rng, avg_microseconds=2)
+    do_busy_work(rand[2], avg_microseconds=2)
 
     # Non-atomic write
-    shared_counter[0] = old_value + 1
+    shared_counter.value = old_value + 1
 
-    rlock.unlock()
+    unlock()
 
-    # Do some work after releasing lock
-    do_busy_work(rng, avg_microseconds=10)
+    # Record the wait outside the lock so it does not add to the hold time
+    if len(waits) < MAX_WAIT_SAMPLES:
+        waits.append(old_value - before)
 
-    stats.locks_performed += 1
+    # Do some work after releasing lock
+    do_busy_work(rand[3], avg_microseconds=10)
 
 
-def recursive_lock_operation(rlock, shared_counter, stats, rng):
+def recursive_lock_operation(lock, unlock, shared_counter, rand, waits):
     """Perform a recursive lock operation"""
     # Do some work before acquiring lock
-    do_busy_work(rng, avg_microseconds=10)
+    do_busy_work(rand[1], avg_microseconds=10)
 
     # Acquire lock recursively (2-4 levels deep)
-    depth = rng.randint(2, 4)
+    depth = 2 + rand[0] % 3
+
+    before = shared_counter.value
 
     for _ in range(depth):
-        rlock.lock()
+        lock()
 
     # Non-atomic read-modify-write
-    old_value = shared_counter[0]
+    old_value = shared_counter.value
 
     # Short work while holding lock
-    do_busy_work(rng, avg_microseconds=2)
+    do_busy_work(rand[2], avg_microseconds=2)
 
     # Non-atomic write
-    shared_counter[0] = old_value + 1
+    shared_counter.value = old_value + 1
 
     # Release all locks
     for _ in range(depth):
-        rlock.unlock()
-
-    # Do some work after releasing lock
-    do_busy_work(rng, avg_microseconds=10)
+        unlock()
 
-    stats.recursive_locks_performed += 1
+    # Record the wait outside the lock so it does not add to the hold time
+    if len(waits) < MAX_WAIT_SAMPLES:
+        waits.append(old_value - before)
 
+    # Do some work after releasing lock
+    do_busy_work(rand[3], avg_microseconds=10)
 
-def worker_thread(rlock, shared_counter, stats, stop_flag):
-    """Worker thread function - runs until stop_flag is set"""
-    # Create per-thread random instance to avoid global state contention
-    rng = random.Random()
 
-    while not stop_flag.is_set():
-        # Randomly choose operation
-        # 50% unlocked work, 30% simple lock, 20% recursive lock
-        op = rng.randint(1, 100)
+def worker_thread(
+    thread_id,
+    rlock,
+    shared_counter,
+    stats,
+    start_barrier,
+    measuring,
+    stop_flag,
+):
+    """Worker thread function - runs until stop_flag is set.
 
-        if op <= 50:
-            do_busy_work(rng)
-        elif op <= 80:
-            lock_operation(rlock, shared_counter, stats, rng)
-        else:
-            recursive_lock_operation(rlock, shared_counter, stats, rng)
+    Counts and lock wait samples from before measuring is set are discarded.
+    """
+    operations = (unlocked_operation, lock_operation, recursive_lock_operation)
+    # Operation counts, indexed by operation id.  Kept local to the thread
+    # and copied to stats once the loop exits.
+    counts = [0, 0, 0]
+    waits = stats.lock_waits[thread_id]
+    # Bind the lock methods once rather than looking them up on every call
+    lock, unlock = rlock.lock, rlock.unlock
+    i = OPS_PER_BATCH
+    measured = False
+
+    # Wait until all workers are ready so they start at the same time
+    start_barrier.wait()
+
+    while not stop_flag.value:
+        if not measured and measuring.value:
+            # The warmup is over.  Its operations are only needed to check
+            # the final counter.
+            stats.warmup_ops_performed[thread_id] = counts[1] + counts[2]
+            counts = [0, 0, 0]
+            del waits[:]
+            measured = True
+        if i == OPS_PER_BATCH:
+            op_ids = os.urandom(OPS_PER_BATCH).translate(OPERATION_TABLE)
+            batch = os.urandom(OPS_PER_BATCH * RANDOM_BYTES_PER_OP)
+            i = 0
+        pos = i * RANDOM_BYTES_PER_OP
+        rand = batch[pos : pos + RANDOM_BYTES_PER_OP]
+        op_id = op_ids[i]
+        operations[op_id](lock, unlock, shared_counter, rand, waits)
+        counts[op_id] += 1
+        i += 1
+
+    stats.locks_performed[thread_id] = counts[1]
+    stats.recursive_locks_performed[thread_id] = counts[2]
+
+
+def native_worker_thread(
+    thread_id,
+    rlock,
+    shared_counter,
+    stats,
+    start_barrier,
+    measuring,
+    stop_flag,
+):
+    """Worker thread that runs the same loop in C, without the GIL.
+
+    This takes the Python interpreter out of the measurement so the
+    throughput reflects the RLock itself.  The warmup is a separate run of
+    the loop that ends when measuring is set.
+    """
+    start_barrier.wait()
+    locks, recursive = rlock_stress_worker(rlock, shared_counter, measuring)
+    stats.warmup_ops_performed[thread_id] = locks + recursive
+    locks, recursive = rlock_stress_worker(rlock, shared_counter, stop_flag)
+    stats.locks_performed[thread_id] = locks
+    stats.recursive_locks_performed[thread_id] = recursive
 
 
-def run_stress_test(threads=8, duration=10):
+def run_stress_test(
+    threads=DEFAULT_THREADS, duration=10, native=False, pin=False, warmup=0
+):
     """Run the stress test and return success status"""
+    stop_requested.clear()
     print("=== RLock Stress Test ===")
     print("Configuration:")
     print(f"  Threads: {threads}")
-    print(f"  Duration: {duration} seconds\n")
+    print(f"  Duration: {duration} seconds")
+    print(f"  Warmup: {warmup} seconds")
+    print(f"  Worker loop: {'native (C)' if native else 'Python'}")
+    print(f"  Pinned to CPUs: {'yes' if pin else 'no'}\n")
+
+    cpu_count = os.process_cpu_count()
+    if cpu_count is not None and threads > cpu_count:
+        print(
+            f"Warning: {threads} threads on {cpu_count} CPUs, "
+            "throughput will include scheduler noise\n"
+        )
+
+    if pin and hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = None
 
     # Create the rlock
     rlock = RLock()
 
-    # Shared counter (using list for mutability)
-    shared_counter = [0]
+    # Shared counter, stored as a raw machine word
+    shared_counter = ctypes.c_uint64(0)
+
+    # Create stop flag.  Workers poll it every iteration and only need to
+    # see the update eventually, so a plain shared int is enough.
+    stop_flag = ctypes.c_int(0)
 
-    # Create stop flag
-    stop_flag = threading.Event()
+    # Set once the warmup is over.  Workers then reset their statistics.
+    measuring = ctypes.c_int(0 if warmup > 0 else 1)
 
-    # Create statistics objects for each thread
-    stats_list = [ThreadStats(i) for i in range(threads)]
+    # Create statistics arrays, one slot per thread
+    stats = ThreadStats(threads)
+
+    # Workers wait on this barrier, along with the main thread, so that
+    # they all start at the same time
+    start_barrier = threading.Barrier(threads + 1)
 
     # Create and start threads
     print("Starting threads...")
     thread_list = []
-    start_time = time.time()
 
+    worker = native_worker_thread if native else worker_thread
     for i in range(threads):
         t = threading.Thread(
-            target=worker_thread,
-            args=(rlock, shared_counter, stats_list[i], stop_flag),
+            target=worker,
+            daemon=True,
+            args=(
+                i,
+                rlock,
+                shared_counter,
+                stats,
+                start_barrier,
+                measuring,
+                stop_flag,
+            ),
         )
         t.start()
+        if cpus:
+            os.sched_setaffinity(t.native_id, {cpus[i % len(cpus)]})
         thread_list.append(t)
 
     print(f"Started {threads} threads")
     print("\nRunning test...")
 
-    # Sleep for test duration
-    time.sleep(duration)
+    # Release the workers and start timing
+    start_barrier.wait()
+    start_time = time.time()
+
+    try:
+        # Let the threads warm up before the measurement window starts
+        if warmup > 0:
+            stop_requested.wait(warmup)
 
-    # Signal threads to stop
-    stop_flag.set()
+        # Every lock operation increments the shared counter exactly once, so
+        # it also counts the lock operations completed so far.
+        warmup_ops = shared_counter.value
+        measurement_start_ns = time.monotonic_ns()
+        measuring.value = 1
+
+        # Sleep for test duration, ending early if a stop is requested
+        stop_requested.wait(duration)
+
+        measured_ops = shared_counter.value - warmup_ops
+        measured_seconds = (time.monotonic_ns() - measurement_start_ns) / 1e9
+    finally:
+        # Signal threads to stop
+        measuring.value = 1
+        stop_flag.value = 1
 
     # Wait for all threads to complete
     for t in thread_list:
@@ -167,14 +325,14 @@ def run_stress_test(threads=8, duration=10):
 
     print(f"\nTest completed in {actual_duration:.2f} seconds\n")
 
-    # Collect statistics
-    total_locks = sum(s.locks_performed for s in stats_list)
-    total_recursive = sum(s.recursive_locks_performed for s in stats_list)
-    total_errors = sum(s.errors_detected for s in stats_list)
+    # Collect statistics.  Only the counter check includes the warmup.
+    total_locks = sum(stats.locks_performed)
+    total_recursive = sum(stats.recursive_locks_performed)
+    total_errors = sum(stats.errors_detected)
     total_ops = total_locks + total_recursive
 
-    expected_counter = total_locks + total_recursive
-    final_counter = shared_counter[0]
+    expected_counter = total_ops + sum(stats.warmup_ops_performed)
+    final_counter = shared_counter.value
 
     # Print results
     print("=== Results ===")
@@ -188,13 +346,40 @@ def run_stress_test(threads=8, duration=10):
             f"  Recursive locks: {total_recursive} ({100.0 * total_recursive / total_ops:.1f}%)"
         )
 
+    print(
+        f"\nThroughput: {measured_ops / measured_seconds:.0f} lock ops/sec "
+        f"({measured_ops} ops in {measured_seconds:.2f} seconds)"
+    )
+
     print("\nPer-thread statistics:")
-    for s in stats_list:
-        total = s.locks_performed + s.recursive_locks_performed
+    for i in range(threads):
+        locks = stats.locks_performed[i]
+        recursive = stats.recursive_locks_performed[i]
+        print(
+            f"  Thread {i}: {locks + recursive} ops "
+            f"({locks} simple, {recursive} recursive, "
+            f"{stats.errors_detected[i]} errors, "
+            f"{(locks + recursive) / measured_seconds:.0f} ops/sec)"
+        )
+    if threads > 1:
+        per_thread = [
+            (stats.locks_performed[i] + stats.recursive_locks_performed[i])
+            / measured_seconds
+            for i in range(threads)
+        ]
+        print(
+            f"  Ops/sec per thread: mean {statistics.mean(per_thread):.0f}, "
+            f"stdev {statistics.stdev(per_thread):.0f}"
+        )
+
+    # Lock waits are only recorded by the Python worker loop
+    waits = [w for thread_waits in stats.lock_waits for w in thread_waits]
+    if len(waits) > 1:
+        q = statistics.quantiles(waits, n=100)
+        print("\nLock wait (acquires by other threads while waiting):")
         print(
-            f"  Thread {s.thread_id}: {total} ops "
-            f"({s.locks_performed} simple, {s.recursive_locks_performed} recursive, "
-            f"{s.errors_detected} errors)"
+            f"  min {min(waits)}, median {q[49]:.0f}, p99 {q[98]:.0f}, "
+            f"max {max(waits)}"
         )
 
     print("\nVerification:")
@@ -223,6 +408,16 @@ def run_stress_test(threads=8, duration=10):
         return False
 
 
+def request_stop(signum, frame):
+    """SIGINT handler that stops the running test.
+
+    A second Ctrl-C raises KeyboardInterrupt as usual, so that a run with
+    a hung worker can still be interrupted.
+    """
+    stop_requested.set()
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+
 def main():
     """Main entry point for command line execution"""
     parser = argparse.ArgumentParser(
@@ -232,8 +427,8 @@ def main():
         "-t",
         "--threads",
         type=int,
-        default=8,
-        help="Number of worker threads (default: 8)",
+        default=DEFAULT_THREADS,
+        help=f"Number of worker threads (default: {DEFAULT_THREADS})",
     )
     parser.add_argument(
         "-d",
@@ -242,10 +437,38 @@ def main():
         default=10,
         help="Test duration in seconds (default: 10)",
     )
+    parser.add_argument(
+        "-n",
+        "--native",
+        action="store_true",
+        help="Run the worker loop in C, without the GIL",
+    )
+    parser.add_argument(
+        "-p",
+        "--pin",
+        action="store_true",
+        help="Pin each worker thread to one CPU (Linux only)",
+    )
+    parser.add_argument(
+        "-w",
+        "--warmup",
+        type=float,
+        default=0,
+        help="Seconds to run before measuring throughput (default: 0)",
+    )
 
     args = parser.parse_args()
 
-    success = run_stress_test(threads=args.threads, duration=args.duration)
+    # Ctrl-C ends the test early rather than leaving the workers running
+    signal.signal(signal.SIGINT, request_stop)
+
+    success = run_stress_test(
+        threads=args.threads,
+        duration=args.duration,
+        native=args.native,
+        pin=args.pin,
+        warmup=args.warmup,
+    )
     import sys
 
     sys.exit(0 if success else 1)
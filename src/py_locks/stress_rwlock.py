@@ -5,18 +5,25 @@ Can be run directly from command line for debugging and performance testing.
 Usage:
     python -m py_locks.stress_rwlock -t 8 -d 10
     python -m py_locks.stress_rwlock -t 8 -d 10 -u  # With upgrade testing
+    python -m py_locks.stress_rwlock -t 8 -d 10 -s  # Per-thread counters
+    python -m py_locks.stress_rwlock -t 8 -d 10 -n  # Worker loop in C
+    python -m py_locks.stress_rwlock -t 8 -d 10 -r 99  # 99% of locks are reads
 """
 
 import argparse
-import random
+import ctypes
+import math
+import os
+import signal
 import threading
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from . import RWLock
+from ._py_locks import busy_wait_ns, rwlock_stress_worker
 
 
-@dataclass
+@dataclass(slots=True)
 class ThreadStats:
     """Statistics for a single thread"""
 
@@ -24,268 +31,507 @@ class ThreadStats:
     reads_performed: int = 0
     writes_performed: int = 0
     recursive_performed: int = 0
-    errors_detected: int = 0
-
-
-@dataclass
-class UpgradeThreadStats:
-    """Statistics for upgrade test mode"""
-
-    thread_id: int
-    reads_performed: int = 0
-    writes_performed: int = 0
+    # try_upgrade() calls, and the waiting upgrade() calls counted apart
     upgrades_attempted: int = 0
     upgrades_succeeded: int = 0
+    wait_upgrades_attempted: int = 0
+    wait_upgrades_succeeded: int = 0
     errors_detected: int = 0
+    # (value1, value2) pairs from the first few inconsistent reads
+    error_samples: list = field(default_factory=list)
 
 
-def busy_wait_microseconds(microseconds):
-    """Busy wait for specified microseconds"""
-    start = time.perf_counter()
-    target = start + (microseconds / 1_000_000)
-    while time.perf_counter() < target:
-        pass
+# Each operation consumes this many random bytes:
+#   [0], [1], [2] busy work jitter before, during and after holding the lock
+#   [3] busy work jitter while holding the write lock after an upgrade
+RANDOM_BYTES_PER_OP = 4
 
+# Random values are generated for this many operations at a time
+OPS_PER_BATCH = 1024
 
-def do_busy_work(rng, avg_microseconds=30):
-    """Do busy work with random duration around the average.
+# Set to end a running test early.  main() sets it on Ctrl-C so that the
+# workers are stopped cleanly and the results are still reported.  Each
+# test clears it when it starts.
+stop_requested = threading.Event()
 
-    Args:
-        rng: Random number generator instance
-        avg_microseconds: Average duration in microseconds (default: 30)
-                         Actual duration will be 0.8 to 1.2 times this value
-    """
-    duration = avg_microseconds * (0.8 + rng.random() * 0.4)
-    busy_wait_microseconds(duration)
+# Operations are picked by mapping a random byte through a table.  Standard
+# mode tables are built by make_operation_table().
+# Upgrade mode: 94% reads with possible upgrade (1), 6% writes (2)
+UPGRADE_OPERATION_TABLE = bytes([1] * 241 + [2] * 15)
 
+# Default percentage of the standard mode's locked operations that are
+# reads.  Half of all operations are unlocked work and the rest are split
+# between reads, writes and recursive writes.
+READ_PERCENT = 96
 
-def reader_operation(rwlock, shared_counter, stats, rng):
-    """Perform a read operation"""
-    # Do some work before acquiring lock
-    do_busy_work(rng)
+# Fraction of reads in upgrade mode that attempt an upgrade
+UPGRADE_PROBABILITY = 0.02
 
-    rwlock.lock_read()
+# Default average busy work durations in microseconds.  Think time is spent
+# without the lock, between operations, and hold time is spent while holding
+# it.
+THINK_MICROSECONDS = 30
+HOLD_MICROSECONDS = 1.5
 
-    # Read the value
-    value1 = shared_counter[0]
+# At most this many inconsistent reads are recorded per thread
+MAX_ERROR_SAMPLES = 16
 
-    # Short work while holding lock
-    do_busy_work(rng, avg_microseconds=1.5)
+# Hold times, in microseconds, measured by the --sweep mode
+SWEEP_HOLD_MICROSECONDS = (0, 0.5, 1.5, 5, 15)
 
-    # Read again - should be the same
-    value2 = shared_counter[0]
+# Spacing between the per-thread counters in sharded mode, in int64 slots.
+# 8 slots is 64 bytes, so each counter sits on its own cache line.
+SHARD_STRIDE = 8
 
-    rwlock.unlock_read()
 
-    # Do some work after releasing lock
-    do_busy_work(rng)
+def make_operation_table(read_percent):
+    """Return the standard mode operation table for a read percentage.
 
-    stats.reads_performed += 1
+    Half of the entries are unlocked work (0).  Of the rest, read_percent
+    are reads (1) and the remainder is split between writes (2) and
+    recursive writes (3).
+    """
+    if not 0 <= read_percent <= 100:
+        raise ValueError(f"read_percent must be 0 to 100: {read_percent}")
+    reads = round(128 * read_percent / 100)
+    writes = (128 - reads + 1) // 2
+    recursive = 128 - reads - writes
+    return bytes([0] * 128 + [1] * reads + [2] * writes + [3] * recursive)
 
-    # Verify consistency
-    if value1 != value2:
-        stats.errors_detected += 1
-        print(
-            f"ERROR: Thread {stats.thread_id} detected inconsistent read: {value1} != {value2}"
-        )
 
+def check_busy_times(think_us, *hold_us):
+    """Raise ValueError if any busy work duration is negative.
 
-def writer_operation(rwlock, shared_counter, stats, rng):
-    """Perform a write operation"""
-    # Do some work before acquiring lock
-    do_busy_work(rng)
+    Checked before the workers start: busy_wait_ns() would raise in every
+    worker, and the native loop would wrap it into an endless wait.
+    """
+    if think_us < 0:
+        raise ValueError(f"think_us must not be negative: {think_us}")
+    for hold in hold_us:
+        if hold < 0:
+            raise ValueError(f"hold_us must not be negative: {hold}")
 
-    rwlock.lock_write()
 
-    # Non-atomic read-modify-write
-    old_value = shared_counter[0]
+def worker_options(native, read_percent):
+    """Return the keyword arguments that set a standard mode worker's mix.
 
-    # Short work while holding write lock
-    do_busy_work(rng, avg_microseconds=1.5)
+    Python workers get a prebuilt operation table and native workers the
+    percentage itself.  Raises ValueError for an invalid read_percent, so
+    call this before starting any worker.
+    """
+    table = make_operation_table(read_percent)
+    if native:
+        return {"read_percent": read_percent}
+    return {"table": table}
 
-    # Non-atomic write
-    shared_counter[0] = old_value + 1
 
-    rwlock.unlock_write()
+def make_counters(threads, sharded):
+    """Return a list with the counter each thread should update.
 
-    # Do some work after releasing lock
-    do_busy_work(rng)
+    Normally every thread shares a single counter.  In sharded mode each
+    thread gets its own counter, padded onto a separate cache line, so that
+    only the lock itself is contended.
+    """
+    if not sharded:
+        return [ctypes.c_int64(0)] * threads
+    shards = (ctypes.c_int64 * (threads * SHARD_STRIDE))()
+    size = ctypes.sizeof(ctypes.c_int64)
+    return [
+        ctypes.c_int64.from_buffer(shards, i * SHARD_STRIDE * size)
+        for i in range(threads)
+    ]
 
-    stats.writes_performed += 1
 
+def do_busy_work(jitter, avg_microseconds=30):
+    """Do busy work with random duration around the average.
 
-def recursive_operation(rwlock, shared_counter, stats, rng):
-    """Perform a recursive lock operation"""
+    Args:
+        jitter: Random byte (0-255) used to vary the duration
+        avg_microseconds: Average duration in microseconds (default: 30)
+                         Actual duration will be 0.8 to 1.2 times this value
+    """
+    busy_wait_ns(int(avg_microseconds * (800 + jitter * (400 / 255))))
+
+
+def reader_operation(
+    lock_read,
+    unlock_read,
+    lock_write,
+    unlock_write,
+    upgrade,
+    shared_counter,
+    error_samples,
+    think_us,
+    hold_us,
+    rand,
+    fallback=False,
+):
+    """Perform a read operation, optionally attempting an upgrade.
+
+    upgrade is None for a plain read, otherwise the RWLock's try_upgrade()
+    or upgrade() method.  If fallback is true and the upgrade fails, the
+    write is still done, by releasing the read lock and taking the write
+    lock.
+
+    Returns a (consistent, upgraded) tuple where upgraded is None if no
+    upgrade was attempted, otherwise the result of the upgrade call.
+    """
     # Do some work before acquiring lock
-    do_busy_work(rng)
-
-    rwlock.lock_write()
-    rwlock.lock_write()  # Recursive
-
-    # Non-atomic increment
-    shared_counter[0] += 1
-
-    rwlock.unlock_write()
-    rwlock.unlock_write()
-
-    # Do some work after releasing lock
-    do_busy_work(rng)
-
-    stats.recursive_performed += 1
-
+    do_busy_work(rand[0], think_us)
 
-# ============ Upgrade Test Mode Operations ============
-
-
-def upgrade_reader_operation(rwlock, shared_counter, stats, rng):
-    """Perform a read operation with possible upgrade"""
-    # Spend most time without lock (90-95% of time)
-    do_busy_work(rng)
-
-    rwlock.lock_read()
+    lock_read()
 
     # Read the value
-    value1 = shared_counter[0]
+    value1 = shared_counter.value
 
     # Short work while holding lock
-    do_busy_work(rng, avg_microseconds=1.5)
+    do_busy_work(rand[1], hold_us)
 
     # Read again - should be the same
-    value2 = shared_counter[0]
+    value2 = shared_counter.value
 
-    # Try to upgrade with lower probability (2% chance)
-    if rng.randint(1, 100) <= 2:
-        stats.upgrades_attempted += 1
-        if rwlock.try_upgrade():
-            stats.upgrades_succeeded += 1
+    # Try to upgrade when the worker asks for it
+    upgraded = None
+    if upgrade is not None:
+        upgraded = upgrade()
+        if upgraded:
             # Successfully upgraded to write lock
             # Increment counter
-            shared_counter[0] += 1
+            shared_counter.value += 1
 
             # Short work as writer
-            do_busy_work(rng, avg_microseconds=1.5)
+            do_busy_work(rand[3], hold_us)
 
             # Release write lock and reacquire read lock
-            rwlock.unlock_write()
-            rwlock.lock_read()
-
-    rwlock.unlock_read()
-
-    # Spend most time without lock (90-95% of time)
-    do_busy_work(rng)
+            unlock_write()
+            lock_read()
+        elif fallback:
+            # Another thread is waiting to upgrade.  It cannot get the lock
+            # until we release our read lock, so write the slow way.
+            unlock_read()
+            lock_write()
+            shared_counter.value += 1
+            do_busy_work(rand[3], hold_us)
+            unlock_write()
+            lock_read()
+
+    unlock_read()
 
-    stats.reads_performed += 1
+    # Do some work after releasing lock
+    do_busy_work(rand[2], think_us)
 
-    # Verify consistency
-    if value1 != value2:
-        stats.errors_detected += 1
-        print(
-            f"ERROR: Thread {stats.thread_id} detected inconsistent read: {value1} != {value2}"
-        )
+    # Verify consistency.  Printing here would serialize the threads on
+    # stdout, so just keep a sample for the report.
+    consistent = value1 == value2
+    if not consistent and len(error_samples) < MAX_ERROR_SAMPLES:
+        error_samples.append((value1, value2))
+    return consistent, upgraded
 
 
-def upgrade_writer_operation(rwlock, shared_counter, stats, rng):
-    """Perform a write operation (low contention mode)"""
-    # Spend most time without lock
-    do_busy_work(rng)
+def writer_operation(
+    lock_write, unlock_write, shared_counter, think_us, hold_us, rand
+):
+    """Perform a write operation"""
+    # Do some work before acquiring lock
+    do_busy_work(rand[0], think_us)
 
-    rwlock.lock_write()
+    lock_write()
 
     # Non-atomic read-modify-write
-    old_value = shared_counter[0]
+    old_value = shared_counter.value
 
     # Short work while holding write lock
-    do_busy_work(rng, avg_microseconds=1.5)
+    do_busy_work(rand[1], hold_us)
 
     # Non-atomic write
-    shared_counter[0] = old_value + 1
+    shared_counter.value = old_value + 1
 
-    rwlock.unlock_write()
+    unlock_write()
 
-    do_busy_work(rng)
+    # Do some work after releasing lock
+    do_busy_work(rand[2], think_us)
 
-    stats.writes_performed += 1
 
+def recursive_operation(
+    lock_write, unlock_write, shared_counter, think_us, rand
+):
+    """Perform a recursive lock operation"""
+    # Do some work before acquiring lock
+    do_busy_work(rand[0], think_us)
 
-def upgrade_worker_thread(rwlock, shared_counter, stats, stop_flag):
-    """Worker thread for upgrade test mode - low contention"""
-    # Create per-thread random instance to avoid global state contention
-    rng = random.Random()
+    lock_write()
+    lock_write()  # Recursive
 
-    while not stop_flag.is_set():
-        # Randomly choose operation
-        # 94% reads (with possible upgrade), 6% writes
-        op = rng.randint(1, 100)
+    # Non-atomic increment
+    shared_counter.value += 1
 
-        if op <= 94:
-            upgrade_reader_operation(rwlock, shared_counter, stats, rng)
-        else:
-            upgrade_writer_operation(rwlock, shared_counter, stats, rng)
+    unlock_write()
+    unlock_write()
 
+    # Do some work after releasing lock
+    do_busy_work(rand[2], think_us)
 
-# ============ Standard Stress Test ============
 
+def reads_until_upgrade():
+    """Return how many reads to skip before the next upgrade attempt.
 
-def worker_thread(rwlock, shared_counter, stats, stop_flag):
-    """Worker thread function - runs until stop_flag is set"""
-    # Create per-thread random instance to avoid global state contention
-    rng = random.Random()
+    The count is drawn from a geometric distribution, so on average a
+    fraction UPGRADE_PROBABILITY of reads attempt an upgrade, without
+    needing a random value for every read.
+    """
+    # Uniform in [0, 1), from 56 random bits
+    fraction = int.from_bytes(os.urandom(7)) / (1 << 56)
+    return int(math.log(1.0 - fraction) / math.log(1.0 - UPGRADE_PROBABILITY))
+
+
+def worker_thread(
+    rwlock,
+    shared_counter,
+    stats,
+    start_barrier,
+    stop_flag,
+    think_us,
+    hold_us,
+    upgrade=False,
+    table=None,
+):
+    """Worker thread function - runs until stop_flag is set.
+
+    table is the standard mode operation table from make_operation_table(),
+    by default the one for READ_PERCENT.  In upgrade mode the operation mix
+    changes to mostly reads, some of which attempt to upgrade to a write
+    lock, and table is ignored.  Upgrade attempts alternate between
+    try_upgrade() and the waiting upgrade(), whose fallback write is counted
+    as a write.
+    """
+    error_samples = stats.error_samples
+    if upgrade:
+        table = UPGRADE_OPERATION_TABLE
+    elif table is None:
+        table = make_operation_table(READ_PERCENT)
+    # Bind the lock methods once rather than looking them up per operation
+    lock_read = rwlock.lock_read
+    unlock_read = rwlock.unlock_read
+    lock_write = rwlock.lock_write
+    unlock_write = rwlock.unlock_write
+    try_upgrade = rwlock.try_upgrade
+    wait_upgrade = rwlock.upgrade
+    waiting = False
+    # Counters are kept local and copied to stats once the loop exits
+    reads = writes = recursive = attempted = succeeded = errors = 0
+    wait_attempted = wait_succeeded = 0
+    # Reads left before the next upgrade attempt.  Outside upgrade mode this
+    # starts negative and so never counts down to zero.
+    upgrade_in = reads_until_upgrade() if upgrade else -1
+    i = OPS_PER_BATCH
+
+    # Wait until all workers are ready so they start at the same time
+    start_barrier.wait()
+
+    while not stop_flag.value:
+        if i == OPS_PER_BATCH:
+            op_ids = os.urandom(OPS_PER_BATCH).translate(table)
+            batch = os.urandom(OPS_PER_BATCH * RANDOM_BYTES_PER_OP)
+            i = 0
+        pos = i * RANDOM_BYTES_PER_OP
+        rand = batch[pos : pos + RANDOM_BYTES_PER_OP]
+        op_id = op_ids[i]
+        i += 1
+
+        if op_id == 0:
+            do_busy_work(rand[0], think_us)
+        elif op_id == 1:
+            # Count down to the next upgrade attempt
+            if upgrade_in == 0:
+                upgrade_in = reads_until_upgrade()
+                waiting = not waiting
+                method = wait_upgrade if waiting else try_upgrade
+            else:
+                upgrade_in -= 1
+                method = None
+            consistent, upgraded = reader_operation(
+                lock_read,
+                unlock_read,
+                lock_write,
+                unlock_write,
+                method,
+                shared_counter,
+                error_samples,
+                think_us,
+                hold_us,
+                rand,
+                fallback=waiting,
+            )
+            reads += 1
+            if not consistent:
+                errors += 1
+            if upgraded is not None and waiting:
+                wait_attempted += 1
+                if upgraded:
+                    wait_succeeded += 1
+                else:
+                    # The fallback did a plain write
+                    writes += 1
+            elif upgraded is not None:
+                attempted += 1
+                if upgraded:
+                    succeeded += 1
+        elif op_id == 2:
+            writer_operation(
+                lock_write,
+                unlock_write,
+                shared_counter,
+                think_us,
+                hold_us,
+                rand,
+            )
+            writes += 1
+        else:
+            recursive_operation(
+                lock_write,
+                unlock_write,
+                shared_counter,
+                think_us,
+                rand,
+            )
+            recursive += 1
+
+    stats.reads_performed = reads
+    stats.writes_performed = writes
+    stats.recursive_performed = recursive
+    stats.upgrades_attempted = attempted
+    stats.upgrades_succeeded = succeeded
+    stats.wait_upgrades_attempted = wait_attempted
+    stats.wait_upgrades_succeeded = wait_succeeded
+    stats.errors_detected = errors
+
+
+def native_worker_thread(
+    rwlock,
+    shared_counter,
+    stats,
+    start_barrier,
+    stop_flag,
+    think_us,
+    hold_us,
+    read_percent=READ_PERCENT,
+):
+    """Worker thread that runs the standard loop in C, without the GIL.
+
+    This takes the Python interpreter out of the measurement so the
+    throughput reflects the RWLock itself.  Inconsistent reads are counted
+    but not sampled.
+    """
+    start_barrier.wait()
+    reads, writes, recursive, errors = rwlock_stress_worker(
+        rwlock,
+        shared_counter,
+        stop_flag,
+        int(think_us * 1000),
+        int(hold_us * 1000),
+        read_percent,
+    )
+    stats.reads_performed = reads
+    stats.writes_performed = writes
+    stats.recursive_performed = recursive
+    stats.errors_detected = errors
 
-    while not stop_flag.is_set():
-        # Randomly choose operation
-        # 50% unlocked work, 48% reads, 2% writes (includes recursive)
-        op = rng.randint(1, 100)
 
-        if op <= 50:
-            do_busy_work(rng)
-        elif op <= 98:
-            reader_operation(rwlock, shared_counter, stats, rng)
-        elif op <= 99:
-            writer_operation(rwlock, shared_counter, stats, rng)
-        else:
-            recursive_operation(rwlock, shared_counter, stats, rng)
+def worker_cpus(pin):
+    """Return the CPUs to pin worker threads to, or None to not pin"""
+    if pin and hasattr(os, "sched_setaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return None
 
 
-def run_stress_test(threads=8, duration=10):
+def print_error_samples(stats_list):
+    """Print the inconsistent reads recorded by each thread"""
+    for s in stats_list:
+        for value1, value2 in s.error_samples:
+            print(f"      Thread {s.thread_id} read {value1} then {value2}")
+
+
+def run_stress_test(
+    threads=8,
+    duration=10,
+    think_us=THINK_MICROSECONDS,
+    hold_us=HOLD_MICROSECONDS,
+    sharded=False,
+    native=False,
+    pin=False,
+    read_percent=READ_PERCENT,
+):
     """Run the stress test and return success status"""
+    check_busy_times(think_us, hold_us)
+    options = worker_options(native, read_percent)
+    stop_requested.clear()
     print("=== RWLock Stress Test ===")
     print("Configuration:")
     print(f"  Threads: {threads}")
-    print(f"  Duration: {duration} seconds\n")
+    print(f"  Duration: {duration} seconds")
+    print(f"  Think time: {think_us} us")
+    print(f"  Hold time: {hold_us} us")
+    print(f"  Sharded counters: {'yes' if sharded else 'no'}")
+    print(f"  Reads: {read_percent}% of locked operations")
+    print(f"  Worker loop: {'native (C)' if native else 'Python'}")
+    print(f"  Pinned to CPUs: {'yes' if pin else 'no'}\n")
 
     # Create the rwlock
     rwlock = RWLock()
 
-    # Shared counter (using list for mutability)
-    shared_counter = [0]
+    # Counters, stored as raw machine words
+    counters = make_counters(threads, sharded)
 
-    # Create stop flag
-    stop_flag = threading.Event()
+    # Create stop flag.  Workers poll it every iteration and only need to
+    # see the update eventually, so a plain shared int is enough.
+    stop_flag = ctypes.c_int(0)
 
     # Create statistics objects for each thread
     stats_list = [ThreadStats(i) for i in range(threads)]
 
+    # Workers wait on this barrier, along with the main thread, so that
+    # they all start at the same time
+    start_barrier = threading.Barrier(threads + 1)
+
     # Create and start threads
     print("Starting threads...")
     thread_list = []
-    start_time = time.time()
+    cpus = worker_cpus(pin)
 
+    worker = native_worker_thread if native else worker_thread
     for i in range(threads):
         t = threading.Thread(
-            target=worker_thread,
-            args=(rwlock, shared_counter, stats_list[i], stop_flag),
+            target=worker,
+            daemon=True,
+            args=(
+                rwlock,
+                counters[i],
+                stats_list[i],
+                start_barrier,
+                stop_flag,
+                think_us,
+                hold_us,
+            ),
+            kwargs=options,
         )
         t.start()
+        if cpus:
+            os.sched_setaffinity(t.native_id, {cpus[i % len(cpus)]})
         thread_list.append(t)
 
     print(f"Started {threads} threads")
     print("\nRunning test...")
 
-    # Sleep for test duration
-    time.sleep(duration)
+    # Release the workers and start timing
+    start_barrier.wait()
+    start_time = time.time()
 
-    # Signal threads to stop
-    stop_flag.set()
+    # Sleep for test duration, ending early if a stop is requested
+    try:
+        stop_requested.wait(duration)
+    finally:
+        # Signal threads to stop
+        stop_flag.value = 1
 
     # Wait for all threads to complete
     for t in thread_list:
@@ -304,7 +550,10 @@ def run_stress_test(threads=8, duration=10):
     total_ops = total_reads + total_writes + total_recursive
 
     expected_counter = total_writes + total_recursive
-    final_counter = shared_counter[0]
+    if sharded:
+        final_counter = sum(c.value for c in counters)
+    else:
+        final_counter = counters[0].value
 
     # Print results
     print("=== Results ===")
@@ -332,8 +581,16 @@ def run_stress_test(threads=8, duration=10):
 
     print("\nVerification:")
 
+    if sharded:
+        # Each thread reads and writes only its own counter, so neither the
+        # read check nor the lost update check can fail
+        print("  - Skipped, each thread has its own counter in sharded mode")
+        print("\nRESULT: NOT VERIFIED")
+        return True
+
     if total_errors > 0:
         print(f"  ✗ Errors detected: {total_errors}")
+        print_error_samples(stats_list)
     else:
         print("  ✓ No errors detected")
 
@@ -356,47 +613,82 @@ def run_stress_test(threads=8, duration=10):
         return False
 
 
-def run_upgrade_test(threads=8, duration=10):
+def run_upgrade_test(
+    threads=8,
+    duration=10,
+    think_us=THINK_MICROSECONDS,
+    hold_us=HOLD_MICROSECONDS,
+    sharded=False,
+    pin=False,
+):
     """Run upgrade test with low contention"""
+    check_busy_times(think_us, hold_us)
+    stop_requested.clear()
     print("=== RWLock Upgrade Test ===")
     print("Configuration:")
     print(f"  Threads: {threads}")
     print(f"  Duration: {duration} seconds")
+    print(f"  Think time: {think_us} us")
+    print(f"  Hold time: {hold_us} us")
+    print(f"  Sharded counters: {'yes' if sharded else 'no'}")
+    print(f"  Pinned to CPUs: {'yes' if pin else 'no'}")
     print("  Mode: Low contention (optimized for upgrade success)\n")
 
     # Create the rwlock
     rwlock = RWLock()
 
-    # Shared counter (using list for mutability)
-    shared_counter = [0]
+    # Counters, stored as raw machine words
+    counters = make_counters(threads, sharded)
 
-    # Create stop flag
-    stop_flag = threading.Event()
+    # Create stop flag.  Workers poll it every iteration and only need to
+    # see the update eventually, so a plain shared int is enough.
+    stop_flag = ctypes.c_int(0)
 
     # Create statistics objects for each thread
-    stats_list = [UpgradeThreadStats(i) for i in range(threads)]
+    stats_list = [ThreadStats(i) for i in range(threads)]
+
+    # Workers wait on this barrier, along with the main thread, so that
+    # they all start at the same time
+    start_barrier = threading.Barrier(threads + 1)
 
     # Create and start threads
     print("Starting threads...")
     thread_list = []
-    start_time = time.time()
+    cpus = worker_cpus(pin)
 
     for i in range(threads):
         t = threading.Thread(
-            target=upgrade_worker_thread,
-            args=(rwlock, shared_counter, stats_list[i], stop_flag),
+            target=worker_thread,
+            daemon=True,
+            args=(
+                rwlock,
+                counters[i],
+                stats_list[i],
+                start_barrier,
+                stop_flag,
+                think_us,
+                hold_us,
+            ),
+            kwargs={"upgrade": True},
         )
         t.start()
+        if cpus:
+            os.sched_setaffinity(t.native_id, {cpus[i % len(cpus)]})
         thread_list.append(t)
 
     print(f"Started {threads} threads")
     print("\nRunning test...")
 
-    # Sleep for test duration
-    time.sleep(duration)
+    # Release the workers and start timing
+    start_barrier.wait()
+    start_time = time.time()
 
-    # Signal threads to stop
-    stop_flag.set()
+    # Sleep for test duration, ending early if a stop is requested
+    try:
+        stop_requested.wait(duration)
+    finally:
+        # Signal threads to stop
+        stop_flag.value = 1
 
     # Wait for all threads to complete
     for t in thread_list:
@@ -412,11 +704,18 @@ def run_upgrade_test(threads=8, duration=10):
     total_writes = sum(s.writes_performed for s in stats_list)
     total_upgrades_attempted = sum(s.upgrades_attempted for s in stats_list)
     total_upgrades_succeeded = sum(s.upgrades_succeeded for s in stats_list)
+    total_wait_attempted = sum(s.wait_upgrades_attempted for s in stats_list)
+    total_wait_succeeded = sum(s.wait_upgrades_succeeded for s in stats_list)
     total_errors = sum(s.errors_detected for s in stats_list)
     total_ops = total_reads + total_writes
 
-    expected_counter = total_writes + total_upgrades_succeeded
-    final_counter = shared_counter[0]
+    expected_counter = (
+        total_writes + total_upgrades_succeeded + total_wait_succeeded
+    )
+    if sharded:
+        final_counter = sum(c.value for c in counters)
+    else:
+        final_counter = counters[0].value
 
     # Print results
     print("=== Results ===")
@@ -431,13 +730,15 @@ def run_upgrade_test(threads=8, duration=10):
         )
 
     print("\nUpgrade statistics:")
-    print(f"  Upgrade attempts:  {total_upgrades_attempted}")
-    print(f"  Upgrade successes: {total_upgrades_succeeded}")
+    print(f"  try_upgrade() attempts:  {total_upgrades_attempted}")
+    print(f"  try_upgrade() successes: {total_upgrades_succeeded}")
     if total_upgrades_attempted > 0:
         success_rate = (
             100.0 * total_upgrades_succeeded / total_upgrades_attempted
         )
-        print(f"  Success rate:      {success_rate:.1f}%")
+        print(f"  Success rate:            {success_rate:.1f}%")
+    print(f"  upgrade() attempts:      {total_wait_attempted}")
+    print(f"  upgrade() successes:     {total_wait_succeeded}")
 
     print("\nPer-thread statistics:")
     for s in stats_list:
@@ -445,56 +746,185 @@ def run_upgrade_test(threads=8, duration=10):
         print(
             f"  Thread {s.thread_id}: {total} ops "
             f"({s.reads_performed} reads, {s.writes_performed} writes, "
-            f"{s.upgrades_succeeded}/{s.upgrades_attempted} upgrades, "
+            f"{s.upgrades_succeeded}/{s.upgrades_attempted} try_upgrade, "
+            f"{s.wait_upgrades_succeeded}/{s.wait_upgrades_attempted} "
+            "upgrade, "
             f"{s.errors_detected} errors)"
         )
 
     print("\nVerification:")
 
-    if total_errors > 0:
-        print(f"  ✗ Errors detected: {total_errors}")
+    if sharded:
+        # Each thread reads and writes only its own counter, so neither the
+        # read check nor the lost update check can fail
+        print("  - Lock checks skipped, each thread has its own counter")
+        verified = True
     else:
-        print("  ✓ No errors detected")
-
-    if final_counter == expected_counter:
-        print("  ✓ Final counter matches expected")
-        print(f"      Actual:   {final_counter}")
-        print(f"      Expected: {expected_counter}")
-    else:
-        print("  ✗ Final counter MISMATCH!")
-        print(f"      Actual:   {final_counter}")
-        print(f"      Expected: {expected_counter}")
-        print(f"      Lost updates: {expected_counter - final_counter}")
+        if total_errors > 0:
+            print(f"  ✗ Errors detected: {total_errors}")
+            print_error_samples(stats_list)
+        else:
+            print("  ✓ No errors detected")
 
-    # Check upgrade success rate
+        if final_counter == expected_counter:
+            print("  ✓ Final counter matches expected")
+            print(f"      Actual:   {final_counter}")
+            print(f"      Expected: {expected_counter}")
+        else:
+            print("  ✗ Final counter MISMATCH!")
+            print(f"      Actual:   {final_counter}")
+            print(f"      Expected: {expected_counter}")
+            print(f"      Lost updates: {expected_counter - final_counter}")
+        verified = total_errors == 0 and final_counter == expected_counter
+
+    # Check the try_upgrade() success rate.  The waiting upgrade() only
+    # fails when another thread is already waiting, so it is not included.
     if total_upgrades_attempted > 0:
         success_rate = (
             100.0 * total_upgrades_succeeded / total_upgrades_attempted
         )
         if success_rate >= 50.0:
             print(
-                f"  ✓ Upgrade success rate is good ({success_rate:.1f}% >= 50%)"
+                "  ✓ try_upgrade() success rate is good "
+                f"({success_rate:.1f}% >= 50%)"
             )
         else:
             print(
-                f"  ✗ Upgrade success rate is low ({success_rate:.1f}% < 50%)"
+                "  ✗ try_upgrade() success rate is low "
+                f"({success_rate:.1f}% < 50%)"
             )
 
     print()
     if (
-        total_errors == 0
-        and final_counter == expected_counter
+        verified
         and total_upgrades_attempted > 0
         and (100.0 * total_upgrades_succeeded / total_upgrades_attempted)
         >= 50.0
     ):
-        print("RESULT: PASS")
+        if sharded:
+            print("RESULT: PASS (upgrade success rate only)")
+        else:
+            print("RESULT: PASS")
         return True
     else:
         print("RESULT: FAIL")
         return False
 
 
+def jain_fairness(values):
+    """Return Jain's fairness index of values.
+
+    The index is 1.0 when every value is equal and 1/n when a single value
+    accounts for everything.
+    """
+    square_sum = sum(x * x for x in values)
+    if square_sum == 0:
+        return 1.0
+    return sum(values) ** 2 / (len(values) * square_sum)
+
+
+def run_sweep(
+    threads=8,
+    duration=10,
+    think_us=THINK_MICROSECONDS,
+    sharded=False,
+    native=False,
+    pin=False,
+    hold_times=SWEEP_HOLD_MICROSECONDS,
+    read_percent=READ_PERCENT,
+):
+    """Run the standard stress test once per hold time and print a table.
+
+    Each row reports lock operations per second and Jain's fairness index
+    over the per-thread operation counts, as tab separated values so the
+    output is easy to plot.  Returns False if any run failed verification.
+    """
+    check_busy_times(think_us, *hold_times)
+    options = worker_options(native, read_percent)
+    stop_requested.clear()
+    success = True
+    worker = native_worker_thread if native else worker_thread
+    cpus = worker_cpus(pin)
+    print("threads\thold_us\tops_per_sec\tfairness\tresult")
+    for hold_us in hold_times:
+        rwlock = RWLock()
+        counters = make_counters(threads, sharded)
+        stop_flag = ctypes.c_int(0)
+        stats_list = [ThreadStats(i) for i in range(threads)]
+        start_barrier = threading.Barrier(threads + 1)
+
+        thread_list = []
+        for i in range(threads):
+            t = threading.Thread(
+                target=worker,
+                daemon=True,
+                args=(
+                    rwlock,
+                    counters[i],
+                    stats_list[i],
+                    start_barrier,
+                    stop_flag,
+                    think_us,
+                    hold_us,
+                ),
+                kwargs=options,
+            )
+            t.start()
+            if cpus:
+                os.sched_setaffinity(t.native_id, {cpus[i % len(cpus)]})
+            thread_list.append(t)
+
+        start_barrier.wait()
+        start_ns = time.monotonic_ns()
+        try:
+            stop_requested.wait(duration)
+        finally:
+            stop_flag.value = 1
+        for t in thread_list:
+            t.join()
+        seconds = (time.monotonic_ns() - start_ns) / 1e9
+
+        thread_ops = [
+            s.reads_performed + s.writes_performed + s.recursive_performed
+            for s in stats_list
+        ]
+        expected_counter = sum(
+            s.writes_performed + s.recursive_performed for s in stats_list
+        )
+        if sharded:
+            final_counter = sum(c.value for c in counters)
+        else:
+            final_counter = counters[0].value
+        passed = final_counter == expected_counter and not any(
+            s.errors_detected for s in stats_list
+        )
+        success = success and passed
+        if sharded:
+            # Nothing can fail with per-thread counters, see run_stress_test()
+            result = "SKIP"
+        else:
+            result = "PASS" if passed else "FAIL"
+
+        print(
+            f"{threads}\t{hold_us}\t{sum(thread_ops) / seconds:.0f}\t"
+            f"{jain_fairness(thread_ops):.4f}\t{result}"
+        )
+        if stop_requested.is_set():
+            # Interrupted, so skip the remaining hold times
+            break
+    return success
+
+
+def request_stop(signum, frame):
+    """SIGINT handler that stops the running test.
+
+    A second Ctrl-C raises KeyboardInterrupt as usual, so that a run with
+    a hung worker can still be interrupted.
+    """
+    stop_requested.set()
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+
 def main():
     """Main entry point for command line execution"""
     parser = argparse.ArgumentParser(
@@ -520,16 +950,96 @@ def main():
         action="store_true",
         help="Run upgrade test mode (low contention, optimized for upgrade success)",
     )
+    parser.add_argument(
+        "-n",
+        "--native",
+        action="store_true",
+        help="Run the worker loop in C, without the GIL "
+        "(not available with --upgrade)",
+    )
+    parser.add_argument(
+        "-p",
+        "--pin",
+        action="store_true",
+        help="Pin each worker thread to one CPU (Linux only)",
+    )
+    parser.add_argument(
+        "--think-us",
+        type=float,
+        default=THINK_MICROSECONDS,
+        help="Average busy work between operations, in microseconds "
+        f"(default: {THINK_MICROSECONDS})",
+    )
+    parser.add_argument(
+        "--hold-us",
+        type=float,
+        default=HOLD_MICROSECONDS,
+        help="Average busy work while holding the lock, in microseconds "
+        f"(default: {HOLD_MICROSECONDS})",
+    )
+    parser.add_argument(
+        "-r",
+        "--read-percent",
+        type=int,
+        default=READ_PERCENT,
+        help="Percentage of locked operations that are reads "
+        f"(default: {READ_PERCENT}, ignored with --upgrade)",
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="Run the standard test once per hold time "
+        f"{SWEEP_HOLD_MICROSECONDS} and print a TSV table of "
+        "ops/sec and fairness",
+    )
+    parser.add_argument(
+        "-s",
+        "--sharded",
+        action="store_true",
+        help="Give each thread its own counter so only the lock is contended "
+        "(skips the correctness checks)",
+    )
 
     args = parser.parse_args()
 
-    if args.upgrade:
+    # Ctrl-C ends the test early rather than leaving the workers running
+    signal.signal(signal.SIGINT, request_stop)
+    if args.native and args.upgrade:
+        parser.error("--native is not available with --upgrade")
+    if not 0 <= args.read_percent <= 100:
+        parser.error("--read-percent must be from 0 to 100")
+    if args.think_us < 0 or args.hold_us < 0:
+        parser.error("--think-us and --hold-us must not be negative")
+
+    if args.sweep:
+        success = run_sweep(
+            threads=args.threads,
+            duration=args.duration,
+            think_us=args.think_us,
+            sharded=args.sharded,
+            native=args.native,
+            pin=args.pin,
+            read_percent=args.read_percent,
+        )
+    elif args.upgrade:
         success = run_upgrade_test(
-            threads=args.threads, duration=args.duration
+            threads=args.threads,
+            duration=args.duration,
+            think_us=args.think_us,
+            hold_us=args.hold_us,
+            sharded=args.sharded,
+            pin=args.pin,
         )
     else:
         success = run_stress_test(
-            threads=args.threads, duration=args.duration
+            threads=args.threads,
+            duration=args.duration,
+            think_us=args.think_us,
+            hold_us=args.hold_us,
+            sharded=args.sharded,
+            native=args.native,
+            pin=args.pin,
+            read_percent=args.read_percent,
         )
 
     import sys
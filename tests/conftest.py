@@ -0,0 +1,27 @@
+"""
+Shared pytest configuration for the py_locks tests.
+"""
+
+import os
+import sys
+
+import pytest
+
+
+def gil_enabled():
+    """Return True unless running on a free-threaded build with the GIL off"""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is None or is_gil_enabled()
+
+
+def pytest_report_header(config):
+    """Show whether the stress tests can run Python code in parallel"""
+    if gil_enabled():
+        return "GIL: enabled (stress test workers only overlap in C code)"
+    return "GIL: disabled (free-threaded build)"
+
+
+@pytest.fixture
+def stress_threads():
+    """Number of stress test threads: one per CPU, but at least 8"""
+    return max(8, os.process_cpu_count() or 8)
@@ -1,8 +1,11 @@
 """
 Basic test for RLock (recursive lock) implementation.
-Tests basic locking, recursive locking, and is_locked_by_current_thread().
+Tests basic locking, recursive locking, lock_n()/unlock_n(), the with
+statement and is_locked_by_current_thread().
 """
 
+import pytest
+
 import py_locks
 
 
@@ -40,6 +43,23 @@ def test_rlock_recursive_locking():
     ), "Lock should not be held after final unlock()"
 
 
+def test_rlock_context_manager():
+    """Test acquiring the lock with the with statement"""
+    m = py_locks.RLock()
+    with m as entered:
+        assert entered is m
+        with m:
+            assert m.is_locked_by_current_thread()
+        assert m.is_locked_by_current_thread()
+    assert not m.is_locked_by_current_thread()
+
+    # The lock is released when the block raises
+    with pytest.raises(KeyError):
+        with m:
+            raise KeyError
+    assert not m.is_locked_by_current_thread()
+
+
 def test_rlock_full_lifecycle():
     """Test full lock lifecycle with recursive locking"""
     m = py_locks.RLock()
@@ -62,3 +82,33 @@ def test_rlock_full_lifecycle():
     # Unlock again
     m.unlock()
     assert not m.is_locked_by_current_thread()
+
+
+def test_rlock_lock_n():
+    """Test acquiring and releasing the lock several times in one call"""
+    m = py_locks.RLock()
+
+    m.lock_n(3)
+    assert m.is_locked_by_current_thread()
+
+    # Release two levels, then the last one with a plain unlock()
+    m.unlock_n(2)
+    assert m.is_locked_by_current_thread()
+    m.unlock()
+    assert not m.is_locked_by_current_thread()
+
+    # Mixing with lock() and releasing everything at once
+    m.lock()
+    m.lock_n(2)
+    m.unlock_n(3)
+    assert not m.is_locked_by_current_thread()
+
+    with pytest.raises(RuntimeError):
+        m.unlock_n(1)
+    with pytest.raises(ValueError):
+        m.lock_n(0)
+    m.lock_n(2)
+    with pytest.raises(ValueError):
+        m.unlock_n(3)
+    m.unlock_n(2)
+    assert not m.is_locked_by_current_thread()
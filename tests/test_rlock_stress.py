@@ -6,7 +6,13 @@ Imports and runs the stress test from the py_locks package.
 from py_locks.stress_rlock import run_stress_test
 
 
-def test_rlock_stress_default():
+def test_rlock_stress_default(stress_threads):
     """Run RLock stress test with default parameters"""
-    success = run_stress_test(threads=8, duration=4)
+    success = run_stress_test(threads=stress_threads, duration=4)
     assert success, "RLock stress test failed"
+
+
+def test_rlock_stress_native(stress_threads):
+    """Run RLock stress test with the worker loop in C"""
+    success = run_stress_test(threads=stress_threads, duration=4, native=True)
+    assert success, "RLock native stress test failed"
@@ -1,8 +1,11 @@
 """
 Basic test for RWLock (reader-writer lock) implementation.
-Tests read/write locking and try_upgrade functionality.
+Tests read/write locking, try_upgrade and upgrade functionality.
 """
 
+import threading
+import time
+
 import py_locks
 
 
@@ -90,3 +93,97 @@ def test_rwlock_upgrade_fallback():
             rwlock.is_locked_by_current_thread()
         ), "Should hold write lock after fallback"
         rwlock.unlock_write()
+
+
+def test_rwlock_upgrade_wait():
+    """Test that upgrade() waits for other readers, ahead of writers"""
+    rwlock = py_locks.RWLock()
+    order = []
+    reader_holding = threading.Event()
+
+    def reader():
+        rwlock.lock_read()
+        reader_holding.set()
+        time.sleep(0.2)
+        rwlock.unlock_read()
+
+    def writer():
+        rwlock.lock_write()
+        order.append("writer")
+        rwlock.unlock_write()
+
+    rwlock.lock_read()
+    reader_thread = threading.Thread(target=reader)
+    reader_thread.start()
+    reader_holding.wait()
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+
+    # Blocks until the other reader leaves, then gets the lock before the
+    # writer that was already waiting
+    assert rwlock.upgrade(), "Upgrade should succeed after readers leave"
+    assert (
+        rwlock.is_locked_by_current_thread()
+    ), "Should hold write lock after upgrade"
+    order.append("upgrader")
+    rwlock.unlock_write()
+
+    reader_thread.join()
+    writer_thread.join()
+    assert order == ["upgrader", "writer"]
+
+
+def run_upgrade_race(rwlock, other):
+    """Hold a read lock in two threads, then race upgrade() against other.
+
+    other is called in the second thread with the read lock held.  If it
+    returns False, the thread releases its read lock, which lets the waiting
+    upgrade() finish.  Returns (upgrade() result, other() result).
+    """
+    both_reading = threading.Barrier(2)
+    results = {}
+
+    def upgrader():
+        rwlock.lock_read()
+        both_reading.wait()
+        results["upgrade"] = rwlock.upgrade()
+        if results["upgrade"]:
+            rwlock.unlock_write()
+        else:
+            rwlock.unlock_read()
+
+    def racer():
+        rwlock.lock_read()
+        both_reading.wait()
+        # Give the upgrader time to start waiting.  The results do not
+        # depend on it, but this way the interesting case is covered.
+        time.sleep(0.05)
+        results["other"] = other()
+        if results["other"]:
+            rwlock.unlock_write()
+        else:
+            rwlock.unlock_read()
+
+    threads = [threading.Thread(target=f) for f in (upgrader, racer)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+        assert not t.is_alive(), "Upgrade race deadlocked"
+    return results["upgrade"], results["other"]
+
+
+def test_rwlock_try_upgrade_while_upgrading():
+    """Test that try_upgrade() fails while another thread waits in upgrade()"""
+    rwlock = py_locks.RWLock()
+    upgraded, tried = run_upgrade_race(rwlock, rwlock.try_upgrade)
+    assert upgraded, "Waiting upgrade should succeed"
+    assert not tried, "try_upgrade() should fail with an upgrader waiting"
+    assert not rwlock.is_locked_by_current_thread()
+
+
+def test_rwlock_upgrade_twice():
+    """Test that only one of two concurrent upgrade() calls succeeds"""
+    rwlock = py_locks.RWLock()
+    first, second = run_upgrade_race(rwlock, rwlock.upgrade)
+    assert first != second, "Exactly one upgrade() should succeed"
@@ -3,12 +3,20 @@ Pytest wrapper for RWLock stress test.
 Imports and runs the stress test from the py_locks package.
 """
 
-from py_locks.stress_rwlock import run_stress_test, run_upgrade_test
+import pytest
 
+from py_locks.stress_rwlock import (
+    jain_fairness,
+    make_operation_table,
+    run_stress_test,
+    run_sweep,
+    run_upgrade_test,
+)
 
-def test_rwlock_stress_default():
+
+def test_rwlock_stress_default(stress_threads):
     """Run RWLock stress test with default parameters"""
-    success = run_stress_test(threads=8, duration=4)
+    success = run_stress_test(threads=stress_threads, duration=4)
     assert success, "RWLock stress test failed"
 
 
@@ -16,3 +24,50 @@ def test_rwlock_upgrade():
     """Run RWLock upgrade test with low contention"""
     success = run_upgrade_test(threads=4, duration=4)
     assert success, "RWLock upgrade test failed"
+
+
+def test_rwlock_sweep():
+    """Run a short hold time sweep"""
+    success = run_sweep(threads=4, duration=1, hold_times=(0, 1.5))
+    assert success, "RWLock sweep failed"
+
+
+def test_jain_fairness():
+    """Check the fairness index at its two extremes"""
+    assert jain_fairness([5, 5, 5, 5]) == 1.0
+    assert jain_fairness([8, 0, 0, 0]) == 0.25
+
+
+def test_make_operation_table():
+    """Check the operation mix for a few read percentages"""
+    table = make_operation_table(96)
+    assert len(table) == 256
+    assert [table.count(op) for op in range(4)] == [128, 123, 3, 2]
+    assert make_operation_table(100).count(1) == 128
+    assert make_operation_table(0).count(1) == 0
+
+
+def test_rwlock_stress_negative_times():
+    """Negative busy work times are rejected before any worker starts"""
+    with pytest.raises(ValueError):
+        run_stress_test(threads=2, duration=1, think_us=-1)
+    with pytest.raises(ValueError):
+        run_upgrade_test(threads=2, duration=1, hold_us=-1)
+    with pytest.raises(ValueError):
+        run_sweep(threads=2, duration=1, hold_times=(0, -1), native=True)
+
+
+def test_rwlock_stress_bad_read_percent():
+    """An invalid read percentage is rejected before any worker starts"""
+    with pytest.raises(ValueError):
+        run_stress_test(threads=2, duration=1, read_percent=101)
+    with pytest.raises(ValueError):
+        run_stress_test(threads=2, duration=1, read_percent=-1, native=True)
+    with pytest.raises(ValueError):
+        run_sweep(threads=2, duration=1, read_percent=101)
+
+
+def test_rwlock_stress_native(stress_threads):
+    """Run RWLock stress test with the worker loop in C"""
+    success = run_stress_test(threads=stress_threads, duration=4, native=True)
+    assert success, "RWLock native stress test failed"